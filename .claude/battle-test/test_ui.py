@@ -4,23 +4,42 @@ UI Testing Script for Mason Dashboard
 Tests each page for rendering, console errors, and basic functionality.
 """
 
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import json
+import re
 import time
 from datetime import datetime
 
 BASE_URL = "http://localhost:3000"
+MAX_WORKERS = 4
+SCREENSHOT_DIR = ".claude/battle-test/screenshots"
 
+# Error text that indicates a page failed to render
+ERROR_TEXT_RE = re.compile(r'Error|Something went wrong|Unexpected|Failed to|Cannot', re.I)
+# Console errors that are expected noise and never fail a page
+NOISE_RE = re.compile(r'favicon|net::err_failed', re.I)
+
+# Assets the checks never inspect; blocking them speeds up page loads
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_HOSTS_RE = re.compile(r'googletagmanager\.com|google-analytics\.com|segment\.io|vercel-insights\.com')
+
+# ready_selector marks the element whose presence means the route has rendered
 PAGES = [
-    {"path": "/", "name": "landing"},
-    {"path": "/auth/signin", "name": "signin"},
-    {"path": "/setup", "name": "setup"},
-    {"path": "/admin/backlog", "name": "backlog"},
-    {"path": "/settings/database", "name": "database-settings"},
-    {"path": "/settings/github", "name": "github-settings"},
-    {"path": "/settings/api-keys", "name": "api-keys"},
+    {"path": "/", "name": "landing", "ready_selector": "main"},
+    {"path": "/auth/signin", "name": "signin", "ready_selector": "button"},
+    {"path": "/setup", "name": "setup", "ready_selector": "h1"},
+    {"path": "/admin/backlog", "name": "backlog", "ready_selector": "main"},
+    {"path": "/settings/database", "name": "database-settings", "ready_selector": "h1"},
+    {"path": "/settings/github", "name": "github-settings", "ready_selector": "h1"},
+    {"path": "/settings/api-keys", "name": "api-keys", "ready_selector": "h1"},
 ]
 
+def take_screenshot(page, path, severity):
+    """Save a JPEG screenshot; only critical issues capture the full page."""
+    page.screenshot(path=path, type="jpeg", quality=60, full_page=(severity == "critical"))
+
 def test_page(page, page_info):
     """Test a single page and return results."""
     url = BASE_URL + page_info["path"]
@@ -45,13 +64,22 @@ def test_page(page, page_info):
     try:
         # Navigate and measure load time
         start_time = time.time()
-        page.goto(url, timeout=15000)
-        page.wait_for_load_state('networkidle', timeout=15000)
+        page.goto(url, wait_until='load', timeout=15000)
+        try:
+            page.wait_for_selector(page_info["ready_selector"], timeout=5000)
+        except PlaywrightTimeoutError:
+            # Route may redirect or render differently; continue with what loaded
+            print(f"  ! [{name}] Ready selector '{page_info['ready_selector']}' not found, continuing")
+        try:
+            # Short quiet-network budget instead of a full networkidle wait
+            page.wait_for_load_state('networkidle', timeout=2000)
+        except PlaywrightTimeoutError:
+            pass
         load_time = int((time.time() - start_time) * 1000)
         result["load_time_ms"] = load_time
 
-        # Check if page has content
-        body_text = page.locator('body').text_content()
+        # Check if page has content (rendered text only, one round-trip)
+        body_text = page.locator('body').inner_text()
 
         if not body_text or len(body_text.strip()) < 10:
             result["status"] = "fail"
@@ -59,34 +87,28 @@ def test_page(page, page_info):
                 "type": "blank_page",
                 "severity": "critical",
                 "description": "Page appears to be blank or has minimal content",
-                "screenshot": f".claude/battle-test/screenshots/UI-{name}-blank.png"
+                "screenshot": f"{SCREENSHOT_DIR}/UI-{name}-blank.jpg"
             })
-            page.screenshot(path=f".claude/battle-test/screenshots/UI-{name}-blank.png", full_page=True)
+            take_screenshot(page, f"{SCREENSHOT_DIR}/UI-{name}-blank.jpg", "critical")
 
         # Check for error text on page
-        error_patterns = ["Error", "Something went wrong", "Unexpected", "Failed to", "Cannot"]
-        for pattern in error_patterns:
-            try:
-                error_elem = page.locator(f"text=/{pattern}/i").first
-                if error_elem.is_visible(timeout=1000):
-                    error_text = error_elem.text_content()
-                    result["status"] = "fail"
-                    result["issues"].append({
-                        "type": "render_fail",
-                        "severity": "high",
-                        "description": f"Error text found on page: {error_text}",
-                        "screenshot": f".claude/battle-test/screenshots/UI-{name}-error.png"
-                    })
-                    page.screenshot(path=f".claude/battle-test/screenshots/UI-{name}-error.png", full_page=True)
-                    break
-            except:
-                pass  # Pattern not found, continue
+        match = ERROR_TEXT_RE.search(body_text or "")
+        if match:
+            error_text = body_text[max(0, match.start() - 40):match.end() + 40].strip()
+            result["status"] = "fail"
+            result["issues"].append({
+                "type": "render_fail",
+                "severity": "high",
+                "description": f"Error text found on page: {error_text}",
+                "screenshot": f"{SCREENSHOT_DIR}/UI-{name}-error.jpg"
+            })
+            take_screenshot(page, f"{SCREENSHOT_DIR}/UI-{name}-error.jpg", "high")
 
         # Check console errors
         if console_errors:
             result["console_errors"] = console_errors
             # Filter out noise and determine if critical
-            critical_errors = [e for e in console_errors if not any(noise in e.lower() for noise in ["favicon", "net::err_failed"])]
+            critical_errors = [e for e in console_errors if not NOISE_RE.search(e)]
 
             if critical_errors:
                 result["status"] = "fail"
@@ -94,9 +116,9 @@ def test_page(page, page_info):
                     "type": "console_error",
                     "severity": "medium",
                     "description": f"Console errors detected: {len(critical_errors)} errors",
-                    "screenshot": f".claude/battle-test/screenshots/UI-{name}-console.png"
+                    "screenshot": f"{SCREENSHOT_DIR}/UI-{name}-console.jpg"
                 })
-                page.screenshot(path=f".claude/battle-test/screenshots/UI-{name}-console.png", full_page=True)
+                take_screenshot(page, f"{SCREENSHOT_DIR}/UI-{name}-console.jpg", "medium")
 
     except Exception as e:
         result["status"] = "fail"
@@ -104,17 +126,48 @@ def test_page(page, page_info):
             "type": "timeout",
             "severity": "critical",
             "description": f"Failed to load page: {str(e)}",
-            "screenshot": f".claude/battle-test/screenshots/UI-{name}-timeout.png"
+            "screenshot": f"{SCREENSHOT_DIR}/UI-{name}-timeout.jpg"
         })
         try:
-            page.screenshot(path=f".claude/battle-test/screenshots/UI-{name}-timeout.png", full_page=True)
+            take_screenshot(page, f"{SCREENSHOT_DIR}/UI-{name}-timeout.jpg", "critical")
         except:
             pass
 
     return result
 
+def block_assets(route):
+    """Abort requests for assets that don't affect the checks."""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_HOSTS_RE.search(request.url):
+        route.abort()
+    else:
+        route.continue_()
+
+def test_pages(page_infos):
+    """Test a batch of pages on a browser owned by the calling thread."""
+    # Playwright objects are not shareable across threads, so each worker
+    # drives its own browser and reuses one context for all of its pages.
+    results = []
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = browser.new_context()
+        context.route("**/*", block_assets)
+        for page_info in page_infos:
+            page = context.new_page()
+            try:
+                results.append(test_page(page, page_info))
+            finally:
+                page.close()
+        context.close()
+        browser.close()
+    return results
+
 def main():
     """Run all UI tests and generate report."""
+    parser = argparse.ArgumentParser(description="UI Testing Script for Mason Dashboard")
+    parser.add_argument("--pretty", action="store_true", help="Indent the JSON results file")
+    args = parser.parse_args()
+
     results = {
         "agent_id": "UI-1",
         "completed_at": datetime.utcnow().isoformat() + "Z",
@@ -127,32 +180,38 @@ def main():
         "pages": []
     }
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-
-        for page_info in PAGES:
-            print(f"Testing {page_info['path']}...")
-            result = test_page(page, page_info)
-            results["pages"].append(result)
-
-            results["summary"]["pages_tested"] += 1
-            if result["status"] == "pass":
-                results["summary"]["pages_passed"] += 1
-                print(f"  ✓ PASS ({result['load_time_ms']}ms)")
-            else:
-                results["summary"]["pages_failed"] += 1
-                results["summary"]["issues_found"] += len(result["issues"])
-                print(f"  ✗ FAIL - {len(result['issues'])} issue(s)")
-                for issue in result["issues"]:
-                    print(f"    - {issue['type']}: {issue['description']}")
-
-        browser.close()
+    workers = min(len(PAGES), MAX_WORKERS)
+    batches = [PAGES[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        by_path = {
+            result["url"]: result
+            for batch in executor.map(test_pages, batches)
+            for result in batch
+        }
+
+    # Workers have finished, so report results in PAGES order
+    for page_info in PAGES:
+        result = by_path[page_info["path"]]
+        results["pages"].append(result)
+
+        results["summary"]["pages_tested"] += 1
+        if result["status"] == "pass":
+            results["summary"]["pages_passed"] += 1
+            print(f"{page_info['path']}: ✓ PASS ({result['load_time_ms']}ms)")
+        else:
+            results["summary"]["pages_failed"] += 1
+            results["summary"]["issues_found"] += len(result["issues"])
+            print(f"{page_info['path']}: ✗ FAIL - {len(result['issues'])} issue(s)")
+            for issue in result["issues"]:
+                print(f"    - {issue['type']}: {issue['description']}")
 
     # Write results
     output_path = ".claude/battle-test/results/UI-1.json"
     with open(output_path, 'w') as f:
-        json.dump(results, f, indent=2)
+        if args.pretty:
+            json.dump(results, f, indent=2)
+        else:
+            json.dump(results, f, separators=(',', ':'))
 
     print(f"\n{'='*60}")
     print(f"UI Testing Complete")
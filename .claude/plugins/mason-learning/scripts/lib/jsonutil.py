@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+JSON Helpers
+
+Fast JSON encoding/decoding for the hooks:
+- Uses orjson when it is installed
+- Falls back to the standard library json module
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson  # Optional: faster (de)serialization on hook hot paths
+except ImportError:
+    orjson = None
+
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so one type covers both
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Deserialize JSON from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_bytes(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON.
+
+    Args:
+        obj: Object to serialize
+        indent: Pretty-print with 2-space indentation
+
+    Returns:
+        Encoded JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    # Compact and UTF-8, like orjson's default output
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize an object to a JSON string."""
+    return dump_bytes(obj, indent).decode('utf-8')
@@ -10,8 +10,15 @@ Utilities for detecting and classifying retry patterns:
 
 import hashlib
 import re
+from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 
+try:
+    import ahocorasick  # Optional: single-pass indicator matching
+except ImportError:
+    ahocorasick = None
+
 
 # Pattern templates for common error scenarios
 PATTERN_TEMPLATES = {
@@ -142,12 +149,125 @@ PATTERN_TEMPLATES = {
 }
 
 
+# Lowercased indicators, computed once so matching only lowercases the message
+_TEMPLATE_INDICATORS = {
+    template_key: [indicator.lower() for indicator in template['indicators']]
+    for template_key, template in PATTERN_TEMPLATES.items()
+}
+
+# Reverse index: each distinct indicator -> templates that list it
+_INDICATOR_TEMPLATES: dict[str, list[str]] = {}
+for _key, _indicators in _TEMPLATE_INDICATORS.items():
+    for _indicator in dict.fromkeys(_indicators):
+        _INDICATOR_TEMPLATES.setdefault(_indicator, []).append(_key)
+
+
+def _build_indicator_automaton():
+    """Build an Aho-Corasick automaton over all indicators, if available."""
+    if ahocorasick is None:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for indicator in _INDICATOR_TEMPLATES:
+        automaton.add_word(indicator, indicator)
+    automaton.make_automaton()
+    return automaton
+
+
+_INDICATOR_AUTOMATON = _build_indicator_automaton()
+
+
+def _find_indicators(error_lower: str) -> set[str]:
+    """Return the distinct indicators present in a lowercased message."""
+    if _INDICATOR_AUTOMATON is not None:
+        return {indicator for _, indicator in _INDICATOR_AUTOMATON.iter(error_lower)}
+
+    # Fallback: one substring scan per distinct indicator
+    return {
+        indicator for indicator in _INDICATOR_TEMPLATES
+        if indicator in error_lower
+    }
+
+
+# Characters reserved for the trigger count in pattern entries, so counts
+# up to 999999 can be updated in place (see rules.update_pattern_triggers)
+TRIGGERS_FIELD_WIDTH = 6
+
+
+# Script name after "npm run"
+_NPM_RUN_RE = re.compile(r'npm run (\S+)')
+
+
+def _short_hash(text: str) -> str:
+    """Return an 8-character hex digest of text."""
+    return hashlib.blake2b(text.encode('utf-8', 'ignore'), digest_size=4).hexdigest()
+
+
+def _bash_goal(command: str) -> Optional[str]:
+    """Group git, npm, Python and file operations; None for other commands."""
+    # Substring tests run in C and beat a regex scan, so keep them in
+    # priority order rather than folding them into one pattern
+
+    # Group git operations
+    if 'git push' in command or 'git pull' in command:
+        return 'git_push'
+    if 'git remote' in command:
+        return 'git_remote'
+    if 'git checkout' in command or 'git branch' in command:
+        return 'git_branch'
+    if 'git clone' in command:
+        return 'git_clone'
+
+    # Group npm operations
+    if 'npm install' in command or 'npm ci' in command:
+        return 'npm_install'
+    if 'npm test' in command or 'npm run test' in command:
+        return 'npm_test'
+    if 'npm run typecheck' in command or 'tsc' in command:
+        return 'npm_typecheck'
+    if 'npm run' in command:
+        # Extract script name
+        match = _NPM_RUN_RE.search(command)
+        if match:
+            return f'npm_run_{match.group(1)}'
+
+    # Group Python operations
+    if 'python' in command or 'pip' in command:
+        return 'python_exec'
+
+    # Group file operations
+    if ('mkdir' in command or 'touch' in command or 'rm' in command
+            or 'cp' in command or 'mv' in command):
+        return 'file_ops'
+
+    return None
+
+
+# Goal rules per tool, tried in order: (matcher, result). A rule with a
+# matcher applies when matcher(command) returns a truthy value; a rule
+# without one always applies. result(match, command) returns the goal hash.
+_GOAL_DISPATCH = {
+    'Bash': [
+        (_bash_goal, lambda goal, _: goal),
+        # Default: hash the command
+        (None, lambda _, command: f'bash_{_short_hash(command)}'),
+    ],
+    # Group file tools by path
+    'Read': [(None, lambda _, command: f'read_{_short_hash(command)}')],
+    'Write': [(None, lambda _, command: f'write_{_short_hash(command)}')],
+    'Edit': [(None, lambda _, command: f'edit_{_short_hash(command)}')],
+    'Glob': [(None, lambda _, command: 'glob_search')],
+    'Grep': [(None, lambda _, command: 'grep_search')],
+}
+
+
 def compute_goal_hash(tool: str, command: str) -> str:
     """
     Compute a hash that groups related operations.
 
     This allows us to detect retry patterns by grouping operations
     that are attempting the same goal (e.g., multiple git push attempts).
+    Rules come from _GOAL_DISPATCH.
 
     Args:
         tool: Tool name (e.g., 'Bash', 'Read')
@@ -156,71 +276,25 @@ def compute_goal_hash(tool: str, command: str) -> str:
     Returns:
         A goal hash string
     """
-    if tool == 'Bash':
-        # Group git operations
-        if 'git push' in command or 'git pull' in command:
-            return 'git_push'
-        if 'git remote' in command:
-            return 'git_remote'
-        if 'git checkout' in command or 'git branch' in command:
-            return 'git_branch'
-        if 'git clone' in command:
-            return 'git_clone'
-
-        # Group npm operations
-        if 'npm install' in command or 'npm ci' in command:
-            return 'npm_install'
-        if 'npm test' in command or 'npm run test' in command:
-            return 'npm_test'
-        if 'npm run typecheck' in command or 'tsc' in command:
-            return 'npm_typecheck'
-        if 'npm run' in command:
-            # Extract script name
-            match = re.search(r'npm run (\S+)', command)
-            if match:
-                return f'npm_run_{match.group(1)}'
-
-        # Group Python operations
-        if 'python' in command or 'pip' in command:
-            return 'python_exec'
-
-        # Group file operations
-        if any(cmd in command for cmd in ['mkdir', 'touch', 'rm', 'cp', 'mv']):
-            return 'file_ops'
-
-        # Default: hash the command
-        cmd_hash = hashlib.md5(command.encode()).hexdigest()[:8]
-        return f'bash_{cmd_hash}'
-
-    if tool == 'Read':
-        # Group reads by file path pattern
-        path_hash = hashlib.md5(command.encode()).hexdigest()[:8]
-        return f'read_{path_hash}'
-
-    if tool == 'Write':
-        path_hash = hashlib.md5(command.encode()).hexdigest()[:8]
-        return f'write_{path_hash}'
-
-    if tool == 'Edit':
-        path_hash = hashlib.md5(command.encode()).hexdigest()[:8]
-        return f'edit_{path_hash}'
-
-    if tool == 'Glob':
-        return 'glob_search'
-
-    if tool == 'Grep':
-        return 'grep_search'
+    for matcher, result in _GOAL_DISPATCH.get(tool, ()):
+        if matcher is None:
+            return result(None, command)
+        match = matcher(command)
+        if match:
+            return result(match, command)
 
     # Default: hash tool + command
-    combined = f'{tool}:{command}'
-    combined_hash = hashlib.md5(combined.encode()).hexdigest()[:8]
+    combined_hash = _short_hash(f'{tool}:{command}')
     return f'{tool.lower()}_{combined_hash}'
 
 
+@lru_cache(maxsize=1024)
 def match_template(error_message: str) -> Optional[dict]:
     """
     Match an error message against pattern templates.
 
+    Results are cached per message; treat the returned dict as read-only.
+
     Args:
         error_message: The error output to match
 
@@ -230,14 +304,15 @@ def match_template(error_message: str) -> Optional[dict]:
     if not error_message:
         return None
 
-    error_lower = error_message.lower()
+    # Count matched indicators per template in a single scan of the message
+    hits: dict[str, int] = {}
+    for indicator in _find_indicators(error_message.lower()):
+        for template_key in _INDICATOR_TEMPLATES[indicator]:
+            hits[template_key] = hits.get(template_key, 0) + 1
 
+    # First template (in definition order) with enough matches wins
     for template_key, template in PATTERN_TEMPLATES.items():
-        # Check if any indicators match
-        matches = sum(
-            1 for indicator in template['indicators']
-            if indicator.lower() in error_lower
-        )
+        matches = hits.get(template_key, 0)
 
         # Require at least 2 indicator matches for confidence
         if matches >= 2:
@@ -252,6 +327,47 @@ def match_template(error_message: str) -> Optional[dict]:
     return None
 
 
+def find_template_key(error_messages: list[str]) -> Optional[str]:
+    """
+    Find the template matched by the first matching error message.
+
+    Args:
+        error_messages: Error messages in the order they were observed
+
+    Returns:
+        Template key or None if no message matches
+    """
+    for msg in error_messages:
+        template_match = match_template(msg)
+        if template_match:
+            return template_match['key']
+
+    return None
+
+
+def get_template(template_key: str) -> Optional[dict]:
+    """
+    Look up a pattern template by key.
+
+    Args:
+        template_key: Key into PATTERN_TEMPLATES
+
+    Returns:
+        Template dict (same fields as match_template, without match_count)
+        or None if the key is unknown
+    """
+    template = PATTERN_TEMPLATES.get(template_key)
+    if template is None:
+        return None
+
+    return {
+        'key': template_key,
+        'category': template['category'],
+        'title': template['title_template'],
+        'lesson': template['lesson_template']
+    }
+
+
 def calculate_confidence(failures: int, error_messages: list[str]) -> float:
     """
     Calculate confidence score for a learning opportunity.
@@ -268,10 +384,7 @@ def calculate_confidence(failures: int, error_messages: list[str]) -> float:
     base_confidence = min(0.4 + (failures * 0.1), 0.8)
 
     # Bonus for pattern template match
-    template_match = any(
-        match_template(msg) for msg in error_messages
-    )
-    if template_match:
+    if find_template_key(error_messages) is not None:
         base_confidence += 0.1
 
     # Bonus for consistent error messages
@@ -286,7 +399,8 @@ def generate_pattern_entry(
     title: str,
     lesson: str,
     confidence: float,
-    triggers: int = 1
+    triggers: int = 1,
+    today: Optional[str] = None
 ) -> str:
     """
     Generate a markdown entry for the learned patterns file.
@@ -297,16 +411,19 @@ def generate_pattern_entry(
         lesson: The lesson learned
         confidence: Confidence score (0.0-1.0)
         triggers: Number of times this pattern was triggered
+        today: Learned date as YYYY-MM-DD (defaults to the current date)
 
     Returns:
         Markdown formatted pattern entry
     """
     confidence_pct = int(confidence * 100)
+    today = today or datetime.now().strftime('%Y-%m-%d')
+    triggers_field = str(triggers).ljust(TRIGGERS_FIELD_WIDTH)
 
     return f"""
 ### {category}: {title}
 
-**Confidence**: {confidence_pct}% | **Triggers**: {triggers} | **Learned**: {__import__('datetime').datetime.now().strftime('%Y-%m-%d')}
+**Confidence**: {confidence_pct}% | **Triggers**: {triggers_field} | **Learned**: {today}
 
 {lesson}
 
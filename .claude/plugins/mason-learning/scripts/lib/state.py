@@ -6,17 +6,104 @@ Manages session state for pattern learning:
 - Tracks tool usage within a session
 - Detects retry patterns (failure followed by success)
 - Persists state between hook invocations
+
+All sessions share one SQLite database (state.sqlite3) in WAL mode. Each
+hook invocation only writes the rows it changes: a tool result is a single
+insert, and a learning opportunity is read, merged and upserted by
+(session_id, goal_hash) inside one BEGIN IMMEDIATE transaction, so hooks
+running in parallel don't lose each other's updates.
 """
 
-import json
 import os
-from dataclasses import dataclass, field, asdict
+import sqlite3
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
+
+from jsonutil import dumps, loads
+
+
+# Number of recent tool results loaded into tool_history
+RECENT_HISTORY_LIMIT = 20
+
+# Maximum tool results kept per session (in memory and in the database)
+HISTORY_MAXLEN = 128
+
+# Seconds to wait for another hook holding the database write lock
+DB_BUSY_TIMEOUT = 5.0
+
+# Bump when _SCHEMA changes
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+
+CREATE TABLE IF NOT EXISTS tool_history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL
+        REFERENCES sessions (session_id) ON DELETE CASCADE,
+    tool TEXT NOT NULL,
+    command TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    error TEXT,
+    goal_hash TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tool_history_session ON tool_history (session_id, seq);
+
+CREATE TABLE IF NOT EXISTS learning_opportunities (
+    session_id TEXT NOT NULL
+        REFERENCES sessions (session_id) ON DELETE CASCADE,
+    goal_hash TEXT NOT NULL,
+    failures INTEGER NOT NULL,
+    success_command TEXT NOT NULL,
+    error_messages TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    template_key TEXT,
+    PRIMARY KEY (session_id, goal_hash)
+);
+"""
+
+_OPPORTUNITY_COLUMNS = (
+    'goal_hash, failures, success_command, error_messages, confidence, template_key'
+)
+
+# slots=True needs Python 3.10+; older versions get regular dataclasses
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Upsert a session row, refreshing its last-activity time
+_TOUCH_SESSION = """
+INSERT INTO sessions (session_id, started_at, updated_at) VALUES (?, ?, ?)
+ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at
+"""
+
+# Insert a learning opportunity, or replace the session's one for its goal_hash
+_UPSERT_OPPORTUNITY = f"""
+INSERT INTO learning_opportunities (session_id, {_OPPORTUNITY_COLUMNS})
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (session_id, goal_hash) DO UPDATE SET
+    failures = excluded.failures,
+    success_command = excluded.success_command,
+    error_messages = excluded.error_messages,
+    confidence = excluded.confidence,
+    template_key = excluded.template_key
+"""
 
+# Connection shared by all calls in this process
+_connection: Optional[sqlite3.Connection] = None
 
-@dataclass
+
+@dataclass(**_DATACLASS_OPTIONS)
 class ToolResult:
     """Represents the result of a tool invocation."""
     tool: str
@@ -27,7 +114,7 @@ class ToolResult:
     timestamp: str
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class LearningOpportunity:
     """Represents a detected learning opportunity (retry pattern)."""
     goal_hash: str
@@ -35,43 +122,23 @@ class LearningOpportunity:
     success_command: str
     error_messages: list[str]
     confidence: float
+    template_key: Optional[str] = None  # Template matched by error_messages
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class SessionState:
     """State for a single Claude session."""
     session_id: str
     started_at: str
-    tool_history: list[ToolResult] = field(default_factory=list)
+    tool_history: deque[ToolResult] = field(
+        default_factory=lambda: deque(maxlen=HISTORY_MAXLEN)
+    )
     learning_opportunities: list[LearningOpportunity] = field(default_factory=list)
 
-    def to_dict(self) -> dict:
-        """Convert to dictionary for JSON serialization."""
-        return {
-            'session_id': self.session_id,
-            'started_at': self.started_at,
-            'tool_history': [asdict(t) for t in self.tool_history],
-            'learning_opportunities': [asdict(l) for l in self.learning_opportunities]
-        }
-
-    @classmethod
-    def from_dict(cls, data: dict) -> 'SessionState':
-        """Create from dictionary."""
-        state = cls(
-            session_id=data['session_id'],
-            started_at=data['started_at']
-        )
-        state.tool_history = [
-            ToolResult(**t) for t in data.get('tool_history', [])
-        ]
-        state.learning_opportunities = [
-            LearningOpportunity(**l) for l in data.get('learning_opportunities', [])
-        ]
-        return state
-
 
+@lru_cache(maxsize=1)
 def get_state_dir() -> Path:
-    """Get the directory for storing state files."""
+    """Get the directory for storing state files (cached per process)."""
     # Use platform-appropriate location
     if os.name == 'nt':  # Windows
         base = Path(os.environ.get('USERPROFILE', '~'))
@@ -79,13 +146,78 @@ def get_state_dir() -> Path:
         base = Path.home()
 
     state_dir = base / '.mason' / 'learning'
-    state_dir.mkdir(parents=True, exist_ok=True)
+    if not state_dir.is_dir():
+        state_dir.mkdir(parents=True, exist_ok=True)
     return state_dir
 
 
-def get_state_file(session_id: str) -> Path:
-    """Get the state file path for a session."""
-    return get_state_dir() / f'state_{session_id}.json'
+def invalidate_cache() -> None:
+    """Forget the cached state directory and close the database connection."""
+    global _connection
+    get_state_dir.cache_clear()
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+def get_db_file() -> Path:
+    """Get the path of the shared state database."""
+    return get_state_dir() / 'state.sqlite3'
+
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    """Create the tables and switch to WAL on first use of a database."""
+    if conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION:
+        return
+
+    # WAL mode is persistent, so it only needs setting once
+    conn.execute('PRAGMA journal_mode=WAL')
+
+    with conn:
+        # Another hook may be setting up the same database; re-check under the lock
+        conn.execute('BEGIN IMMEDIATE')
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+
+        # executescript() would commit, so run the statements one at a time
+        for statement in _SCHEMA.split(';'):
+            conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    # Remove per-session files left by older versions
+    state_dir = get_state_dir()
+    for pattern in ('state_*.json', 'history_*.ndjson'):
+        for f in state_dir.glob(pattern):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+
+def get_db() -> sqlite3.Connection:
+    """Get the process-wide connection to the state database."""
+    global _connection
+    if _connection is None:
+        conn = sqlite3.connect(get_db_file(), timeout=DB_BUSY_TIMEOUT)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        _init_schema(conn)
+        _connection = conn
+    return _connection
+
+
+def _opportunity_from_row(row: tuple) -> LearningOpportunity:
+    """Build a LearningOpportunity from a row selected with _OPPORTUNITY_COLUMNS."""
+    goal_hash, failures, success_command, error_messages, confidence, template_key = row
+    return LearningOpportunity(
+        goal_hash=goal_hash,
+        failures=failures,
+        success_command=success_command,
+        error_messages=loads(error_messages),
+        confidence=confidence,
+        template_key=template_key
+    )
 
 
 def get_session_id() -> str:
@@ -104,93 +236,174 @@ def get_session_id() -> str:
 
 def load_state(session_id: Optional[str] = None) -> SessionState:
     """
-    Load session state from file.
+    Load session state from the database.
+
+    Only the most recent RECENT_HISTORY_LIMIT tool results are loaded into
+    tool_history.
 
     Args:
         session_id: Session ID (uses current session if None)
 
     Returns:
-        SessionState object (new or loaded from file)
+        SessionState object (new or loaded from the database)
     """
     if session_id is None:
         session_id = get_session_id()
 
-    state_file = get_state_file(session_id)
+    conn = get_db()
+    row = conn.execute(
+        'SELECT started_at FROM sessions WHERE session_id = ?', (session_id,)
+    ).fetchone()
 
-    if state_file.exists():
-        try:
-            with open(state_file, 'r') as f:
-                data = json.load(f)
-                return SessionState.from_dict(data)
-        except (json.JSONDecodeError, KeyError):
-            # Corrupted file, start fresh
-            pass
-
-    # Create new state
-    return SessionState(
+    state = SessionState(
         session_id=session_id,
-        started_at=datetime.now().isoformat()
+        started_at=row[0] if row else datetime.now().isoformat()
     )
 
+    if row:
+        state.learning_opportunities = [
+            _opportunity_from_row(opportunity_row)
+            for opportunity_row in conn.execute(
+                f'SELECT {_OPPORTUNITY_COLUMNS} FROM learning_opportunities'
+                ' WHERE session_id = ? ORDER BY rowid',
+                (session_id,)
+            )
+        ]
+        state.tool_history.extend(load_recent_tool_history(session_id))
+
+    return state
+
 
-def save_state(state: SessionState) -> None:
+def update_learning_opportunity(
+    session_id: str,
+    goal_hash: str,
+    update: Callable[[Optional[LearningOpportunity]], LearningOpportunity]
+) -> LearningOpportunity:
     """
-    Save session state to file.
+    Atomically create or update a session's learning opportunity for a goal.
+
+    The stored opportunity is re-read while holding the database write lock,
+    so updates made by hooks running in parallel are merged rather than lost.
 
     Args:
-        state: SessionState to save
+        session_id: Session ID
+        goal_hash: Goal hash identifying the opportunity
+        update: Called with the stored opportunity (or None if there is none
+            yet); returns the opportunity to store
+
+    Returns:
+        The stored LearningOpportunity
+    """
+    conn = get_db()
+    with conn:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            f'SELECT {_OPPORTUNITY_COLUMNS} FROM learning_opportunities'
+            ' WHERE session_id = ? AND goal_hash = ?',
+            (session_id, goal_hash)
+        ).fetchone()
+
+        opportunity = update(_opportunity_from_row(row) if row else None)
+        conn.execute(_TOUCH_SESSION, (session_id, datetime.now().isoformat(), time.time()))
+        conn.execute(
+            _UPSERT_OPPORTUNITY,
+            (session_id, opportunity.goal_hash, opportunity.failures,
+             opportunity.success_command, dumps(opportunity.error_messages),
+             opportunity.confidence, opportunity.template_key)
+        )
+    return opportunity
+
+
+def append_tool_result(session_id: str, tool_result: ToolResult) -> None:
+    """
+    Record a tool result in the session's history.
+
+    Only the last HISTORY_MAXLEN results per session are kept.
+
+    Args:
+        session_id: Session ID
+        tool_result: ToolResult to record
+    """
+    conn = get_db()
+    with conn:
+        conn.execute(_TOUCH_SESSION, (session_id, datetime.now().isoformat(), time.time()))
+        conn.execute(
+            'INSERT INTO tool_history (session_id, tool, command, success, error,'
+            ' goal_hash, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (session_id, tool_result.tool, tool_result.command,
+             tool_result.success, tool_result.error, tool_result.goal_hash,
+             tool_result.timestamp)
+        )
+        # Drop results older than the newest HISTORY_MAXLEN
+        conn.execute(
+            'DELETE FROM tool_history WHERE session_id = ? AND seq < ('
+            ' SELECT seq FROM tool_history WHERE session_id = ?'
+            ' ORDER BY seq DESC LIMIT 1 OFFSET ?)',
+            (session_id, session_id, HISTORY_MAXLEN - 1)
+        )
+
+
+def load_recent_tool_history(
+    session_id: str,
+    limit: int = RECENT_HISTORY_LIMIT
+) -> list[ToolResult]:
     """
-    state_file = get_state_file(state.session_id)
+    Load the most recent tool results for a session.
+
+    Args:
+        session_id: Session ID
+        limit: Maximum number of results to return
 
-    with open(state_file, 'w') as f:
-        json.dump(state.to_dict(), f, indent=2)
+    Returns:
+        List of ToolResult objects, oldest first
+    """
+    rows = get_db().execute(
+        'SELECT tool, command, success, error, goal_hash, timestamp'
+        ' FROM tool_history WHERE session_id = ? ORDER BY seq DESC LIMIT ?',
+        (session_id, limit)
+    ).fetchall()
+
+    return [
+        ToolResult(
+            tool=tool,
+            command=command,
+            success=bool(success),
+            error=error,
+            goal_hash=goal_hash,
+            timestamp=timestamp
+        )
+        for tool, command, success, error, goal_hash, timestamp in reversed(rows)
+    ]
 
 
 def delete_state(session_id: str) -> None:
     """
-    Delete a session state file.
+    Delete a session's state and tool history.
 
     Args:
         session_id: Session ID to delete
     """
-    state_file = get_state_file(session_id)
-    if state_file.exists():
-        state_file.unlink()
+    conn = get_db()
+    with conn:
+        conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
 
 
 def list_sessions() -> list[str]:
-    """List all session IDs with state files."""
-    state_dir = get_state_dir()
-    sessions = []
-
-    for f in state_dir.glob('state_*.json'):
-        session_id = f.stem.replace('state_', '')
-        sessions.append(session_id)
-
-    return sessions
+    """List all session IDs with stored state."""
+    rows = get_db().execute('SELECT session_id FROM sessions ORDER BY started_at')
+    return [session_id for session_id, in rows]
 
 
 def cleanup_old_sessions(max_age_hours: int = 24) -> int:
     """
-    Clean up state files older than max_age_hours.
+    Clean up sessions with no activity in the last max_age_hours.
 
     Returns:
-        Number of files cleaned up
+        Number of sessions cleaned up
     """
-    state_dir = get_state_dir()
-    now = datetime.now()
-    cleaned = 0
-
-    for f in state_dir.glob('state_*.json'):
-        try:
-            # Check file modification time
-            mtime = datetime.fromtimestamp(f.stat().st_mtime)
-            age_hours = (now - mtime).total_seconds() / 3600
-
-            if age_hours > max_age_hours:
-                f.unlink()
-                cleaned += 1
-        except OSError:
-            pass
+    cutoff = time.time() - max_age_hours * 3600
 
-    return cleaned
+    conn = get_db()
+    with conn:
+        cursor = conn.execute('DELETE FROM sessions WHERE updated_at < ?', (cutoff,))
+    return cursor.rowcount
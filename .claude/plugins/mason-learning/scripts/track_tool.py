@@ -13,19 +13,31 @@ Input (from stdin as JSON):
   "success": true
 }
 
-Output: None (writes to state file)
+Output: None (records the result and updates session state)
 """
 
-import json
 import sys
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
 # Add lib directory to path
 sys.path.insert(0, str(Path(__file__).parent / 'lib'))
 
-from state import load_state, save_state, ToolResult, LearningOpportunity
-from patterns import compute_goal_hash, calculate_confidence
+from jsonutil import JSONDecodeError, dumps, loads
+from state import (
+    load_state,
+    append_tool_result,
+    update_learning_opportunity,
+    RECENT_HISTORY_LIMIT,
+    ToolResult,
+    LearningOpportunity
+)
+from patterns import compute_goal_hash, calculate_confidence, find_template_key
+
+
+# Configuration
+MAX_STORED_ERRORS = 5  # Maximum distinct error messages per opportunity
 
 
 def main():
@@ -38,8 +50,8 @@ def main():
             sys.exit(0)
 
         try:
-            event = json.loads(input_data)
-        except json.JSONDecodeError:
+            event = loads(input_data)
+        except JSONDecodeError:
             # Invalid JSON, skip silently
             sys.exit(0)
 
@@ -51,7 +63,7 @@ def main():
 
         # Some tools return structured results
         if isinstance(result, dict):
-            result = json.dumps(result)
+            result = dumps(result)
 
         # Determine the command/operation
         # For Bash, this is the command; for Read, the file path, etc.
@@ -73,7 +85,8 @@ def main():
             timestamp=datetime.now().isoformat()
         )
 
-        # Add to history
+        # Add to history (a single insert; learning opportunities are saved separately)
+        append_tool_result(state.session_id, tool_result)
         state.tool_history.append(tool_result)
 
         # Check for learning opportunity
@@ -82,10 +95,12 @@ def main():
         # 2. Followed by a success with the same goal_hash
         if success:
             # Find recent failures with the same goal hash
+            # Look at the last 20 operations, newest first
             recent_failures = [
-                t for t in state.tool_history[-20:]  # Look at last 20 operations
+                t for t in islice(reversed(state.tool_history), RECENT_HISTORY_LIMIT)
                 if t.goal_hash == goal_hash and not t.success
             ]
+            recent_failures.reverse()
 
             if len(recent_failures) >= 1:
                 # We have a retry pattern!
@@ -97,32 +112,34 @@ def main():
                     error_messages
                 )
 
-                # Check if we already have this learning opportunity
-                existing = next(
-                    (l for l in state.learning_opportunities
-                     if l.goal_hash == goal_hash),
-                    None
-                )
+                def merge(existing):
+                    """Fold this retry into the stored opportunity, or start one."""
+                    if existing:
+                        # Update existing
+                        existing.failures += len(recent_failures)
+                        existing.success_command = command[:500]
+                        # Merge new errors, dropping duplicates but keeping order
+                        merged = dict.fromkeys(existing.error_messages)
+                        merged.update(dict.fromkeys(error_messages))
+                        existing.error_messages = list(merged)[:MAX_STORED_ERRORS]
+                        existing.confidence = max(existing.confidence, confidence)
+                        if existing.template_key is None:
+                            existing.template_key = find_template_key(error_messages)
+                        return existing
 
-                if existing:
-                    # Update existing
-                    existing.failures += len(recent_failures)
-                    existing.success_command = command[:500]
-                    existing.error_messages.extend(error_messages)
-                    existing.confidence = max(existing.confidence, confidence)
-                else:
                     # Create new learning opportunity
-                    opportunity = LearningOpportunity(
+                    stored_errors = list(dict.fromkeys(error_messages))[:MAX_STORED_ERRORS]
+                    return LearningOpportunity(
                         goal_hash=goal_hash,
                         failures=len(recent_failures),
                         success_command=command[:500],
-                        error_messages=error_messages[:5],  # Limit stored errors
-                        confidence=confidence
+                        error_messages=stored_errors,
+                        confidence=confidence,
+                        template_key=find_template_key(stored_errors)
                     )
-                    state.learning_opportunities.append(opportunity)
 
-        # Save updated state
-        save_state(state)
+                # Merged against the stored copy, so parallel hooks don't lose updates
+                update_learning_opportunity(state.session_id, goal_hash, merge)
 
     except Exception as e:
         # Log errors but don't fail the hook
@@ -105,6 +105,7 @@ function Install-Files {
         Invoke-WebRequest -Uri "$githubRaw/plugins/mason-learning/scripts/lib/state.py" -OutFile ".claude/plugins/mason-learning/scripts/lib/state.py"
         Invoke-WebRequest -Uri "$githubRaw/plugins/mason-learning/scripts/lib/patterns.py" -OutFile ".claude/plugins/mason-learning/scripts/lib/patterns.py"
         Invoke-WebRequest -Uri "$githubRaw/plugins/mason-learning/scripts/lib/rules.py" -OutFile ".claude/plugins/mason-learning/scripts/lib/rules.py"
+        Invoke-WebRequest -Uri "$githubRaw/plugins/mason-learning/scripts/lib/jsonutil.py" -OutFile ".claude/plugins/mason-learning/scripts/lib/jsonutil.py"
 
         # Download commands
         Invoke-WebRequest -Uri "$githubRaw/commands/mason-patterns.md" -OutFile ".claude/commands/mason-patterns.md"
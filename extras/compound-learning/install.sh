@@ -149,6 +149,7 @@ install_files() {
         curl -fsSL "$GITHUB_RAW/plugins/mason-learning/scripts/lib/state.py" -o .claude/plugins/mason-learning/scripts/lib/state.py
         curl -fsSL "$GITHUB_RAW/plugins/mason-learning/scripts/lib/patterns.py" -o .claude/plugins/mason-learning/scripts/lib/patterns.py
         curl -fsSL "$GITHUB_RAW/plugins/mason-learning/scripts/lib/rules.py" -o .claude/plugins/mason-learning/scripts/lib/rules.py
+        curl -fsSL "$GITHUB_RAW/plugins/mason-learning/scripts/lib/jsonutil.py" -o .claude/plugins/mason-learning/scripts/lib/jsonutil.py
 
         # Download commands
         curl -fsSL "$GITHUB_RAW/commands/mason-patterns.md" -o .claude/commands/mason-patterns.md
@@ -5,18 +5,19 @@ Analyze Session Hook (Stop)
 This hook runs when a Claude Code session ends.
 It analyzes the session for learning opportunities and updates the rules file.
 
-Input: None (reads from state file)
+Input: None (reads session state)
 Output: Prints summary to stderr (non-blocking)
 """
 
 import sys
+from datetime import datetime
 from pathlib import Path
 
 # Add lib directory to path
 sys.path.insert(0, str(Path(__file__).parent / 'lib'))
 
 from state import load_state, delete_state, cleanup_old_sessions
-from patterns import match_template, generate_pattern_entry
+from patterns import get_template, generate_pattern_entry
 from rules import (
     is_duplicate,
     write_pattern,
@@ -48,29 +49,26 @@ def main():
         # Process learning opportunities
         patterns_created = 0
         patterns_updated = 0
+        today = datetime.now().strftime('%Y-%m-%d')
 
-        # Sort by confidence (highest first)
+        # Sort by confidence (highest first), skipping low-confidence ones
         opportunities = sorted(
-            state.learning_opportunities,
+            (opp for opp in state.learning_opportunities
+             if opp.confidence >= MIN_CONFIDENCE),
             key=lambda x: x.confidence,
             reverse=True
         )
 
         for opp in opportunities:
-            # Skip low-confidence opportunities
-            if opp.confidence < MIN_CONFIDENCE:
-                continue
-
-            # Stop if we've created enough patterns this session
+            # Stop if we've created enough patterns this session; updates to
+            # existing patterns don't count toward the cap
             if patterns_created >= MAX_PATTERNS_PER_SESSION:
                 break
 
-            # Try to match against a pattern template
+            # Use the pattern template matched when the opportunity was recorded
             template_match = None
-            for error_msg in opp.error_messages:
-                template_match = match_template(error_msg)
-                if template_match:
-                    break
+            if opp.template_key:
+                template_match = get_template(opp.template_key)
 
             if template_match:
                 category = template_match['category']
@@ -106,38 +104,29 @@ def main():
                     title=title,
                     lesson=lesson,
                     confidence=opp.confidence,
-                    triggers=opp.failures
+                    triggers=opp.failures,
+                    today=today
                 )
 
                 if write_pattern(pattern_entry):
                     patterns_created += 1
 
-        # Clean up state file
+        # Clean up session state
         delete_state(state.session_id)
 
-        # Clean up old state files
+        # Clean up old sessions
         cleanup_old_sessions(24)
 
         # Print summary to stderr (informational only)
         total_patterns = count_patterns()
         if patterns_created > 0 or patterns_updated > 0:
-            print(
-                f'\n\u26a1 Mason learned {patterns_created} new pattern(s) this session.',
-                file=sys.stderr
-            )
+            lines = [f'\n\u26a1 Mason learned {patterns_created} new pattern(s) this session.']
             if patterns_updated > 0:
-                print(
-                    f'   Updated {patterns_updated} existing pattern(s).',
-                    file=sys.stderr
-                )
-            print(
-                f'   Total patterns: {total_patterns}',
-                file=sys.stderr
-            )
-            print(
-                '   Run /mason patterns to view.',
-                file=sys.stderr
-            )
+                lines.append(f'   Updated {patterns_updated} existing pattern(s).')
+            lines.append(f'   Total patterns: {total_patterns}')
+            lines.append('   Run /mason patterns to view.')
+            # Single write instead of one per line
+            sys.stderr.write('\n'.join(lines) + '\n')
 
     except Exception as e:
         # Log errors but don't fail
@@ -7,17 +7,51 @@ Manages the learned patterns rules file:
 - Write new patterns
 - Check for duplicates
 - Archive old patterns
+
+A sidecar index maps each pattern to the byte offset of its trigger count, so
+duplicate checks and trigger updates don't rescan or rewrite the rules file.
+Indexes live under ~/.mason/learning/rules-index/, keyed by a hash of the
+rules file path, so nothing machine-specific lands in the project. The index
+records the rules file's mtime and size and is rebuilt whenever they no
+longer match.
 """
 
+import hashlib
+import os
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+from jsonutil import JSONDecodeError, dump_bytes, loads
+from state import get_state_dir
+
+
+INDEX_VERSION = 1
+
+# Pattern heading (### Category: Title)
+_RE_TITLE = re.compile(r'^### ([^:\n]+): (.+)$', re.MULTILINE)
+
+# Pattern heading and trigger count, as bytes
+_RE_INDEX_HEADING = re.compile(rb'^### ([^:\n]+): (.+?)\r?$', re.MULTILINE)
+# Trigger field: the count plus any padding reserved before the " | " separator
+_RE_INDEX_TRIGGERS = re.compile(rb'\*\*Triggers\*\*: (\d+(?: *(?= \|))?)')
+
+# Indexes already loaded in this process, by rules file path. Entries are
+# reused while the rules file's mtime/size still match.
+_index_cache: dict[Path, dict] = {}
 
 
 def get_rules_file() -> Path:
     """Get the path to the learned patterns rules file."""
+    return _find_rules_file(os.getcwd())
+
+
+@lru_cache(maxsize=4)
+def _find_rules_file(cwd: str) -> Path:
+    """Locate the rules file for a working directory (cached per cwd)."""
     # Search upward for .claude directory
-    current = Path.cwd()
+    current = Path(cwd)
     while current != current.parent:
         rules_dir = current / '.claude' / 'rules'
         if rules_dir.exists():
@@ -25,17 +59,25 @@ def get_rules_file() -> Path:
         current = current.parent
 
     # Fall back to current directory
-    rules_dir = Path.cwd() / '.claude' / 'rules'
+    rules_dir = Path(cwd) / '.claude' / 'rules'
     rules_dir.mkdir(parents=True, exist_ok=True)
     return rules_dir / 'learned-patterns.md'
 
 
+def invalidate_cache() -> None:
+    """Forget cached rules file locations and loaded indexes."""
+    _find_rules_file.cache_clear()
+    _index_cache.clear()
+
+
 def ensure_rules_file_exists(rules_path: Optional[Path] = None) -> Path:
     """Ensure the rules file exists with proper header."""
     if rules_path is None:
         rules_path = get_rules_file()
 
-    if not rules_path.exists():
+    try:
+        os.stat(rules_path)
+    except FileNotFoundError:
         rules_path.parent.mkdir(parents=True, exist_ok=True)
         with open(rules_path, 'w') as f:
             f.write("""# Learned Patterns
@@ -50,6 +92,129 @@ These patterns help Claude avoid common mistakes by learning from previous error
     return rules_path
 
 
+def get_index_file(rules_path: Path) -> Path:
+    """Get the sidecar index path for a rules file."""
+    key = hashlib.sha256(os.path.abspath(rules_path).encode('utf-8')).hexdigest()[:16]
+    return get_state_dir() / 'rules-index' / f'{key}.json'
+
+
+def _scan_patterns(content: bytes, base_offset: int = 0) -> dict:
+    """
+    Index the patterns in a chunk of the rules file.
+
+    Args:
+        content: Raw bytes of the rules file (or an appended entry)
+        base_offset: File offset at which content starts
+
+    Returns:
+        Dict of pattern_id -> {'offset', 'width', 'triggers'}, or None for
+        patterns without a trigger count
+    """
+    patterns: dict[str, Optional[dict]] = {}
+    headings = list(_RE_INDEX_HEADING.finditer(content))
+
+    for i, heading in enumerate(headings):
+        pattern_id = (
+            f'{heading.group(1).decode("utf-8", "replace")}: '
+            f'{heading.group(2).decode("utf-8", "replace")}'
+        )
+        if pattern_id in patterns:
+            # Keep the first occurrence, like the title scan does
+            continue
+
+        section_end = headings[i + 1].start() if i + 1 < len(headings) else len(content)
+        match = _RE_INDEX_TRIGGERS.search(content, heading.end(), section_end)
+        if match:
+            patterns[pattern_id] = {
+                'offset': base_offset + match.start(1),
+                'width': match.end(1) - match.start(1),
+                'triggers': int(match.group(1).rstrip())
+            }
+        else:
+            patterns[pattern_id] = None
+
+    return patterns
+
+
+def _save_index(rules_path: Path, index: dict) -> None:
+    """Stamp the index with the rules file's current mtime/size and save it."""
+    stat = rules_path.stat()
+    index['mtime_ns'] = stat.st_mtime_ns
+    index['size'] = stat.st_size
+    _index_cache[rules_path] = index
+
+    index_path = get_index_file(rules_path)
+    tmp_path = index_path.with_suffix('.tmp')
+    try:
+        index_path.parent.mkdir(exist_ok=True)
+        tmp_path.write_bytes(dump_bytes(index))
+        os.replace(tmp_path, index_path)
+    except OSError:
+        # The index is only a cache; it will be rebuilt next time
+        pass
+
+
+def build_index(rules_path: Path) -> dict:
+    """
+    Rebuild the sidecar index from the rules file.
+
+    Args:
+        rules_path: Path to rules file
+
+    Returns:
+        The rebuilt index
+    """
+    index = {
+        'version': INDEX_VERSION,
+        'patterns': _scan_patterns(rules_path.read_bytes())
+    }
+    _save_index(rules_path, index)
+    return index
+
+
+def load_index(rules_path: Optional[Path] = None) -> dict:
+    """
+    Load the sidecar index, rebuilding it if it is missing or stale.
+
+    After the first load, the index is served from memory with a single
+    stat of the rules file to check it is still current.
+
+    Args:
+        rules_path: Path to rules file (uses default if None)
+
+    Returns:
+        Index dict with a 'patterns' mapping
+    """
+    if rules_path is None:
+        rules_path = get_rules_file()
+
+    try:
+        stat = rules_path.stat()
+    except FileNotFoundError:
+        stat = ensure_rules_file_exists(rules_path).stat()
+
+    def is_current(index: dict) -> bool:
+        return (
+            index.get('version') == INDEX_VERSION
+            and index.get('mtime_ns') == stat.st_mtime_ns
+            and index.get('size') == stat.st_size
+        )
+
+    index = _index_cache.get(rules_path)
+    if index is not None and is_current(index):
+        return index
+
+    try:
+        index = loads(get_index_file(rules_path).read_bytes())
+        if is_current(index):
+            _index_cache[rules_path] = index
+            return index
+    except (OSError, JSONDecodeError, AttributeError):
+        pass
+
+    return build_index(rules_path)
+
+
 def read_patterns(rules_path: Optional[Path] = None) -> str:
     """
     Read the current contents of the rules file.
@@ -80,11 +245,39 @@ def extract_pattern_titles(content: str) -> list[str]:
         List of pattern titles (e.g., ['Git: Verify Remote Before Push'])
     """
     # Match ### Category: Title
-    pattern = r'^### ([^:]+): (.+)$'
-    matches = re.findall(pattern, content, re.MULTILINE)
+    matches = _RE_TITLE.findall(content)
     return [f'{cat}: {title}' for cat, title in matches]
 
 
+def iter_pattern_titles(rules_path: Optional[Path] = None) -> Iterator[str]:
+    """
+    Yield pattern titles from the rules file one line at a time.
+
+    Matches the same headings as extract_pattern_titles without loading
+    the whole file.
+
+    Args:
+        rules_path: Path to rules file (uses default if None)
+
+    Yields:
+        Pattern titles (e.g., 'Git: Verify Remote Before Push')
+    """
+    if rules_path is None:
+        rules_path = get_rules_file()
+
+    rules_path = ensure_rules_file_exists(rules_path)
+
+    with open(rules_path, 'r') as f:
+        for line in f:
+            if not line.startswith('### '):
+                continue
+
+            # ### Category: Title
+            category, sep, title = line[4:].rstrip('\n').partition(':')
+            if category and sep and title[:1] == ' ' and len(title) > 1:
+                yield f'{category}: {title[1:]}'
+
+
 def is_duplicate(
     category: str,
     title: str,
@@ -101,10 +294,8 @@ def is_duplicate(
     Returns:
         True if pattern exists, False otherwise
     """
-    content = read_patterns(rules_path)
     pattern_id = f'{category}: {title}'
-    existing = extract_pattern_titles(content)
-    return pattern_id in existing
+    return pattern_id in load_index(rules_path)['patterns']
 
 
 def write_pattern(
@@ -124,10 +315,17 @@ def write_pattern(
     if rules_path is None:
         rules_path = get_rules_file()
 
-    rules_path = ensure_rules_file_exists(rules_path)
+    index = load_index(rules_path)
+    data = pattern_entry.encode('utf-8')
 
-    with open(rules_path, 'a') as f:
-        f.write(pattern_entry)
+    with open(rules_path, 'ab') as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(data)
+
+    # Index the new entry without rescanning the file
+    for pattern_id, entry in _scan_patterns(data, offset).items():
+        index['patterns'].setdefault(pattern_id, entry)
+    _save_index(rules_path, index)
 
     return True
 
@@ -142,8 +340,7 @@ def count_patterns(rules_path: Optional[Path] = None) -> int:
     Returns:
         Number of patterns
     """
-    content = read_patterns(rules_path)
-    return len(extract_pattern_titles(content))
+    return sum(1 for _ in iter_pattern_titles(rules_path))
 
 
 def update_pattern_triggers(
@@ -165,24 +362,31 @@ def update_pattern_triggers(
     if rules_path is None:
         rules_path = get_rules_file()
 
-    content = read_patterns(rules_path)
+    index = load_index(rules_path)
     pattern_id = f'{category}: {title}'
 
-    # Find and update the pattern
-    # Pattern format: **Confidence**: XX% | **Triggers**: N
-    pattern = rf'(### {re.escape(pattern_id)}.*?Triggers\*\*: )(\d+)'
-
-    match = re.search(pattern, content, re.DOTALL)
-    if not match:
+    entry = index['patterns'].get(pattern_id)
+    if entry is None:
         return False
 
-    current_triggers = int(match.group(2))
-    new_triggers = current_triggers + 1
-
-    updated_content = content[:match.start(2)] + str(new_triggers) + content[match.end(2):]
-
-    with open(rules_path, 'w') as f:
-        f.write(updated_content)
+    new_triggers = str(entry['triggers'] + 1).encode('ascii')
+
+    if len(new_triggers) <= entry['width']:
+        # Fits the reserved field: overwrite it in place
+        with open(rules_path, 'r+b') as f:
+            f.seek(entry['offset'])
+            f.write(new_triggers.ljust(entry['width']))
+        entry['triggers'] += 1
+        _save_index(rules_path, index)
+        return True
+
+    # Count outgrew the field (e.g. unpadded entries): splice it in and
+    # reindex, since later offsets shift
+    content = rules_path.read_bytes()
+    start = entry['offset']
+    end = start + entry['width']
+    rules_path.write_bytes(content[:start] + new_triggers + content[end:])
+    build_index(rules_path)
 
     return True
 
@@ -225,11 +429,10 @@ def get_patterns_summary(rules_path: Optional[Path] = None) -> dict:
     Returns:
         Dict with pattern counts by category
     """
-    content = read_patterns(rules_path)
-    titles = extract_pattern_titles(content)
-
+    titles = []
     categories: dict[str, int] = {}
-    for title in titles:
+    for title in iter_pattern_titles(rules_path):
+        titles.append(title)
         if ':' in title:
             category = title.split(':')[0].strip()
             categories[category] = categories.get(category, 0) + 1
@@ -14,81 +14,199 @@ Tests:
 Usage:
   python3 scripts/with_server.py --server "cd packages/mason-dashboard && pnpm dev" --port 3000 \\
     -- python3 scripts/e2e_test_mason.py
+
+Environment:
+  MASON_E2E_SCREENSHOT: always | on-failure (default) | never
 """
 
+import itertools
+import os
 import sys
 import json
+import threading
+from collections import deque
 import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Deque, Dict, List, Optional
 
 try:
-    from playwright.sync_api import sync_playwright, Page, Browser, BrowserContext, expect
+    from playwright.sync_api import sync_playwright, Page, expect, TimeoutError as PlaywrightTimeoutError
 except ImportError:
     print("ERROR: Playwright not installed. Install with: pip install playwright && playwright install chromium")
     sys.exit(1)
 
+try:
+    import orjson  # Optional: faster results serialization
+except ImportError:
+    orjson = None
+
+MAX_WORKERS = 4  # Browsers driving tests in parallel
+API_MAX_WORKERS = 10  # Concurrent API endpoint probes
+CONSOLE_MAXLEN = 500  # Console messages kept per test and for the whole run
+CONSOLE_TYPES = ("error", "warning")  # Console levels worth recording
+SCREENSHOT_MODES = ("always", "on-failure", "never")
+BROWSER_ARGS = ["--disable-dev-shm-usage"]  # Small /dev/shm in CI containers
+PROFILE_DIR = Path("/tmp/mason-e2e-profile")  # Persistent browser profiles, one per worker
+# Site data cleared before each test; the HTTP and code caches stay warm
+CLEARED_STORAGE_TYPES = "local_storage,indexeddb,websql,service_workers,cache_storage,file_systems"
+DEFAULT_VIEWPORT = {"width": 1920, "height": 1080}
+RESPONSIVE_VIEWPORTS = [
+    ("Mobile", 375, 667),
+    ("Tablet", 768, 1024),
+    ("Desktop", 1920, 1080),
+]
+
 
 class MasonE2ETestSuite:
     def __init__(self, base_url: str = "http://localhost:3000"):
         self.base_url = base_url
-        self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
-        self.page: Optional[Page] = None
         self.screenshots_dir = Path("/tmp/mason-e2e-screenshots")
         self.test_results: List[Dict] = []
-        self.console_messages: List[Dict] = []
+        self.console_messages: Deque[Dict] = deque(maxlen=CONSOLE_MAXLEN)
+        self._lock = threading.Lock()  # Guards results/messages/stdout across workers
+        self._output = threading.local()  # Per-worker buffer for the running test's output
+        # One wall-clock stamp per run; screenshots add a sequence number and
+        # results record milliseconds since the suite started
+        self._run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._seq = itertools.count()
+        self._t0 = time.monotonic()
+        self.screenshot_mode = os.environ.get("MASON_E2E_SCREENSHOT", "on-failure")
+        if self.screenshot_mode not in SCREENSHOT_MODES:
+            print(f"ERROR: MASON_E2E_SCREENSHOT must be one of: {', '.join(SCREENSHOT_MODES)}")
+            sys.exit(1)
 
         # Create screenshots directory
         self.screenshots_dir.mkdir(exist_ok=True)
 
-    def setup(self):
-        """Initialize browser and page."""
-        print("🚀 Setting up test environment...")
-        playwright = sync_playwright().start()
-        self.browser = playwright.chromium.launch(headless=True)
-        self.context = self.browser.new_context(
-            viewport={"width": 1920, "height": 1080},
-            # Add any auth tokens here if needed
-        )
-        self.page = self.context.new_page()
-
-        # Capture console messages
-        self.page.on("console", lambda msg: self.console_messages.append({
-            "type": msg.type,
-            "text": msg.text,
-            "location": msg.location
-        }))
-
-        # Capture page errors
-        self.page.on("pageerror", lambda err: self.console_messages.append({
-            "type": "error",
-            "text": str(err),
-            "location": None
-        }))
-
-        print(f"✓ Browser ready: {self.browser.version}")
-
-    def teardown(self):
-        """Close browser and cleanup."""
-        if self.page:
-            self.page.close()
-        if self.context:
-            self.context.close()
-        if self.browser:
-            self.browser.close()
-        print("✓ Browser closed")
-
-    def take_screenshot(self, name: str, full_page: bool = True):
-        """Take a screenshot with timestamp."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{name}.png"
+    def reset_browser_state(self, context, page: Page):
+        """Clear cookies and site storage so no test sees an earlier one's state."""
+        context.clear_cookies()
+        parts = urllib.parse.urlsplit(self.base_url)
+        cdp = context.new_cdp_session(page)
+        try:
+            cdp.send("Storage.clearDataForOrigin", {
+                "origin": f"{parts.scheme}://{parts.netloc}",
+                "storageTypes": CLEARED_STORAGE_TYPES
+            })
+        finally:
+            cdp.detach()
+
+    def run_tests(self, worker: int, tasks: List[Callable[[Page, Deque[Dict]], None]]):
+        """Run a batch of tests on a browser owned by the calling thread."""
+        # Playwright objects are not shareable across threads, so each worker
+        # launches its own browser and gives every test a fresh page. The
+        # browser keeps a persistent profile so later runs start with a warm
+        # HTTP and code cache; cookies and storage are cleared per test.
+        # Chromium locks a profile, so each worker has its own.
+        user_data_dir = PROFILE_DIR / f"worker-{worker}"
+        user_data_dir.mkdir(parents=True, exist_ok=True)
+        with sync_playwright() as playwright:
+            context = playwright.chromium.launch_persistent_context(
+                user_data_dir=str(user_data_dir),
+                headless=True,
+                viewport=DEFAULT_VIEWPORT,
+                args=BROWSER_ARGS,
+                # Add any auth tokens here if needed
+            )
+            with self._lock:
+                print(f"✓ Browser ready: {user_data_dir}")
+            try:
+                for test in tasks:
+                    self._output.lines = []
+                    page = context.new_page()
+                    console_messages: Deque[Dict] = deque(maxlen=CONSOLE_MAXLEN)
+
+                    # Capture console errors and warnings
+                    def on_console(msg, messages=console_messages):
+                        if msg.type not in CONSOLE_TYPES:
+                            return
+                        messages.append({
+                            "type": msg.type,
+                            "text": msg.text,
+                            "location": msg.location
+                        })
+
+                    page.on("console", on_console)
+
+                    # Capture page errors
+                    page.on("pageerror", lambda err, messages=console_messages: messages.append({
+                        "type": "error",
+                        "text": str(err),
+                        "location": None
+                    }))
+
+                    try:
+                        self.reset_browser_state(context, page)
+                        test(page, console_messages)
+                    finally:
+                        page.close()
+                        # Print the test's output in one block so workers don't interleave
+                        with self._lock:
+                            self.console_messages.extend(console_messages)
+                            print("\n".join(self._output.lines))
+            finally:
+                context.close()
+
+    def log(self, message: str):
+        """Buffer a line of the running test's output; run_tests() prints it."""
+        self._output.lines.append(message)
+
+    def take_screenshot(self, page: Page, name: str, passed: bool = True) -> Optional[Path]:
+        """
+        Take a screenshot named after the run, subject to screenshot_mode.
+
+        Passing steps are only captured in "always" mode, as a viewport shot.
+        Failures get a full-page shot unless the mode is "never".
+        """
+        if self.screenshot_mode == "never" or (passed and self.screenshot_mode != "always"):
+            return None
+
+        filename = f"{self._run_id}_{next(self._seq):03d}_{name}.png"
         path = self.screenshots_dir / filename
-        self.page.screenshot(path=str(path), full_page=full_page)
-        print(f"  📸 Screenshot: {path}")
+        try:
+            page.screenshot(path=str(path), full_page=not passed)
+        except Exception as e:
+            if passed:
+                raise
+            # The page may be unusable after a failure; don't mask the result
+            self.log(f"  ! Screenshot failed: {e}")
+            return None
+        self.log(f"  📸 Screenshot: {path}")
         return path
 
+    def probe_endpoint(self, path: str, method: str, body: Optional[Dict]) -> int:
+        """Request an API endpoint and return the HTTP status code."""
+        # Plain urllib rather than page.request: Playwright's sync objects
+        # can only be used from the thread that created them.
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(body).encode() if body is not None else None,
+            headers={"Content-Type": "application/json"} if body is not None else {},
+            method=method
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def expect_ready(self, page: Page, selector: str, timeout: int = 5000):
+        """Wait for the element a test needs; raises AssertionError if it never appears."""
+        expect(page.locator(selector).first).to_be_attached(timeout=timeout)
+
+    def wait_for_ready(self, page: Page, selector: str, timeout: int = 5000) -> bool:
+        """Wait for an element that may legitimately be absent; False if it never appears."""
+        try:
+            page.locator(selector).first.wait_for(state="attached", timeout=timeout)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
     def record_test_result(self, test_name: str, passed: bool, message: str = "", details: Dict = None):
         """Record test result."""
         result = {
@@ -96,16 +214,16 @@ class MasonE2ETestSuite:
             "passed": passed,
             "message": message,
             "details": details or {},
-            "timestamp": datetime.now().isoformat()
+            "t_rel_ms": int((time.monotonic() - self._t0) * 1000)
         }
-        self.test_results.append(result)
-
         status = "✓" if passed else "✗"
-        print(f"  {status} {test_name}: {message}")
+        with self._lock:
+            self.test_results.append(result)
+        self.log(f"  {status} {test_name}: {message}")
 
-    def check_console_errors(self, test_name: str):
-        """Check for console errors."""
-        errors = [msg for msg in self.console_messages if msg["type"] == "error"]
+    def check_console_errors(self, page: Page, test_name: str, console_messages: Deque[Dict]):
+        """Check for console errors, capturing the page if there are any."""
+        errors = [msg for msg in console_messages if msg["type"] == "error"]
         if errors:
             self.record_test_result(
                 f"{test_name} - Console Errors",
@@ -113,6 +231,8 @@ class MasonE2ETestSuite:
                 f"Found {len(errors)} console error(s)",
                 {"errors": errors[:5]}  # Limit to first 5
             )
+            name = test_name.lower().replace(" ", "_")
+            self.take_screenshot(page, f"{name}_console_errors", passed=False)
         else:
             self.record_test_result(
                 f"{test_name} - Console Errors",
@@ -123,44 +243,44 @@ class MasonE2ETestSuite:
     # =========================================================================
     # TEST: Home Page
     # =========================================================================
-    def test_home_page(self):
+    def test_home_page(self, page: Page, console_messages: Deque[Dict]):
         """Test that home page loads without errors."""
-        print("\n🧪 Test: Home Page")
+        self.log("\n🧪 Test: Home Page")
         try:
-            self.console_messages.clear()
-            self.page.goto(self.base_url)
-            self.page.wait_for_load_state("networkidle", timeout=10000)
+            page.goto(self.base_url)
+            page.wait_for_load_state("domcontentloaded", timeout=10000)
+            self.expect_ready(page, "main")
 
-            self.take_screenshot("01_home_page")
+            self.take_screenshot(page, "01_home_page")
 
             # Check page title
-            title = self.page.title()
+            title = page.title()
             self.record_test_result(
                 "Home Page - Load",
                 True,
                 f"Page loaded successfully: {title}"
             )
 
-            self.check_console_errors("Home Page")
+            self.check_console_errors(page, "Home Page", console_messages)
 
         except Exception as e:
             self.record_test_result("Home Page - Load", False, str(e))
+            self.take_screenshot(page, "01_home_page", passed=False)
 
     # =========================================================================
     # TEST: Backlog Page
     # =========================================================================
-    def test_backlog_page(self):
+    def test_backlog_page(self, page: Page, console_messages: Deque[Dict]):
         """Test backlog page."""
-        print("\n🧪 Test: Backlog Page")
+        self.log("\n🧪 Test: Backlog Page")
         try:
-            self.console_messages.clear()
-            self.page.goto(f"{self.base_url}/admin/backlog")
-            self.page.wait_for_load_state("networkidle", timeout=10000)
+            page.goto(f"{self.base_url}/admin/backlog")
+            page.wait_for_load_state("domcontentloaded", timeout=10000)
 
-            # Wait a bit for any dynamic content
-            time.sleep(2)
+            # Wait for the dynamic content to render
+            self.expect_ready(page, "main")
 
-            self.take_screenshot("02_backlog_page")
+            self.take_screenshot(page, "02_backlog_page")
 
             # Check if page loaded
             self.record_test_result(
@@ -169,25 +289,24 @@ class MasonE2ETestSuite:
                 "Backlog page loaded successfully"
             )
 
-            self.check_console_errors("Backlog Page")
+            self.check_console_errors(page, "Backlog Page", console_messages)
 
         except Exception as e:
             self.record_test_result("Backlog Page - Load", False, str(e))
+            self.take_screenshot(page, "02_backlog_page", passed=False)
 
     # =========================================================================
     # TEST: Setup Wizard
     # =========================================================================
-    def test_setup_wizard(self):
+    def test_setup_wizard(self, page: Page, console_messages: Deque[Dict]):
         """Test setup wizard and platform selector."""
-        print("\n🧪 Test: Setup Wizard")
+        self.log("\n🧪 Test: Setup Wizard")
         try:
-            self.console_messages.clear()
-            self.page.goto(f"{self.base_url}/setup")
-            self.page.wait_for_load_state("networkidle", timeout=10000)
-
-            time.sleep(2)
+            page.goto(f"{self.base_url}/setup")
+            page.wait_for_load_state("domcontentloaded", timeout=10000)
+            self.expect_ready(page, "h1")
 
-            self.take_screenshot("03_setup_wizard")
+            self.take_screenshot(page, "03_setup_wizard")
 
             self.record_test_result(
                 "Setup Wizard - Load",
@@ -198,9 +317,9 @@ class MasonE2ETestSuite:
             # Try to navigate to complete step (may need to click through steps)
             # Look for platform selection buttons
             try:
-                platform_buttons = self.page.locator('button:has-text("macOS"), button:has-text("Windows"), button:has-text("Linux")')
+                platform_buttons = page.locator('button:has-text("macOS"), button:has-text("Windows"), button:has-text("Linux")')
 
-                if platform_buttons.count() > 0:
+                if self.wait_for_ready(page, 'button:has-text("macOS")'):
                     self.record_test_result(
                         "Setup Wizard - Platform Selector",
                         True,
@@ -211,11 +330,10 @@ class MasonE2ETestSuite:
                     platforms = ["macOS", "Windows", "Linux"]
                     for platform in platforms:
                         try:
-                            btn = self.page.locator(f'button:has-text("{platform}")')
+                            btn = page.locator(f'button:has-text("{platform}")')
                             if btn.count() > 0:
                                 btn.first.click()
-                                time.sleep(0.5)
-                                self.take_screenshot(f"03_{platform.lower()}_selected")
+                                self.take_screenshot(page, f"03_{platform.lower()}_selected")
                                 self.record_test_result(
                                     f"Setup Wizard - {platform} Selection",
                                     True,
@@ -227,9 +345,10 @@ class MasonE2ETestSuite:
                                 False,
                                 f"Error selecting {platform}: {str(e)}"
                             )
+                            self.take_screenshot(page, f"03_{platform.lower()}_selected", passed=False)
 
                     # Check if install command changes
-                    install_command = self.page.locator('code')
+                    install_command = page.locator('code')
                     if install_command.count() > 0:
                         command_text = install_command.first.text_content()
                         self.record_test_result(
@@ -255,18 +374,20 @@ class MasonE2ETestSuite:
                     False,
                     f"Error testing platform selector: {str(e)}"
                 )
+                self.take_screenshot(page, "03_platform_selector", passed=False)
 
-            self.check_console_errors("Setup Wizard")
+            self.check_console_errors(page, "Setup Wizard", console_messages)
 
         except Exception as e:
             self.record_test_result("Setup Wizard - Load", False, str(e))
+            self.take_screenshot(page, "03_setup_wizard", passed=False)
 
     # =========================================================================
     # TEST: API Endpoints (requires auth)
     # =========================================================================
-    def test_api_endpoints(self):
+    def test_api_endpoints(self, page: Page, console_messages: Deque[Dict]):
         """Test API endpoints."""
-        print("\n🧪 Test: API Endpoints")
+        self.log("\n🧪 Test: API Endpoints")
 
         # Note: These tests will likely fail with 401 without proper auth
         # but we can verify the endpoints respond correctly to missing auth
@@ -275,60 +396,68 @@ class MasonE2ETestSuite:
             ("/api/v1/backlog/next", "GET", None),
         ]
 
-        for path, method, body in endpoints:
+        def probe(endpoint):
             try:
-                url = f"{self.base_url}{path}"
-                response = self.page.request.fetch(url, method=method)
-
-                # We expect 401 without auth - that's a PASS
-                if response.status == 401:
-                    self.record_test_result(
-                        f"API - {method} {path}",
-                        True,
-                        f"Endpoint responds correctly (401 without auth)"
-                    )
-                elif response.status < 500:
-                    # Any 2xx, 3xx, 4xx is acceptable (endpoint is working)
-                    self.record_test_result(
-                        f"API - {method} {path}",
-                        True,
-                        f"Endpoint responds with status {response.status}"
-                    )
-                else:
-                    # 5xx is a failure
-                    self.record_test_result(
-                        f"API - {method} {path}",
-                        False,
-                        f"Server error: {response.status}"
-                    )
+                return self.probe_endpoint(*endpoint), None
             except Exception as e:
+                return None, e
+
+        # Probe all endpoints concurrently; results are recorded in order
+        workers = min(len(endpoints), API_MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(probe, endpoints))
+
+        for (path, method, body), (status, error) in zip(endpoints, outcomes):
+            if error is not None:
                 self.record_test_result(
                     f"API - {method} {path}",
                     False,
-                    f"Error: {str(e)}"
+                    f"Error: {str(error)}"
+                )
+            # We expect 401 without auth - that's a PASS
+            elif status == 401:
+                self.record_test_result(
+                    f"API - {method} {path}",
+                    True,
+                    f"Endpoint responds correctly (401 without auth)"
+                )
+            elif status < 500:
+                # Any 2xx, 3xx, 4xx is acceptable (endpoint is working)
+                self.record_test_result(
+                    f"API - {method} {path}",
+                    True,
+                    f"Endpoint responds with status {status}"
+                )
+            else:
+                # 5xx is a failure
+                self.record_test_result(
+                    f"API - {method} {path}",
+                    False,
+                    f"Server error: {status}"
                 )
 
     # =========================================================================
     # TEST: Responsive Design
     # =========================================================================
-    def test_responsive_design(self):
+    def test_responsive_design(self, page: Page, console_messages: Deque[Dict]):
         """Test responsive design at different viewport sizes."""
-        print("\n🧪 Test: Responsive Design")
+        self.log("\n🧪 Test: Responsive Design")
 
-        viewports = [
-            ("Mobile", 375, 667),
-            ("Tablet", 768, 1024),
-            ("Desktop", 1920, 1080),
-        ]
+        # Load once; resizing the viewport only reflows the page
+        try:
+            page.goto(f"{self.base_url}/admin/backlog")
+            page.wait_for_load_state("domcontentloaded", timeout=10000)
+            self.expect_ready(page, "main")
+        except Exception as e:
+            self.record_test_result("Responsive - Load", False, f"Error: {str(e)}")
+            self.take_screenshot(page, "04_responsive_load", passed=False)
+            return
 
-        for name, width, height in viewports:
+        for name, width, height in RESPONSIVE_VIEWPORTS:
             try:
-                self.page.set_viewport_size({"width": width, "height": height})
-                self.page.goto(f"{self.base_url}/admin/backlog")
-                self.page.wait_for_load_state("networkidle", timeout=10000)
-                time.sleep(1)
+                page.set_viewport_size({"width": width, "height": height})
 
-                self.take_screenshot(f"04_responsive_{name.lower()}")
+                self.take_screenshot(page, f"04_responsive_{name.lower()}")
 
                 self.record_test_result(
                     f"Responsive - {name} ({width}x{height})",
@@ -341,9 +470,7 @@ class MasonE2ETestSuite:
                     False,
                     f"Error: {str(e)}"
                 )
-
-        # Reset viewport
-        self.page.set_viewport_size({"width": 1920, "height": 1080})
+                self.take_screenshot(page, f"04_responsive_{name.lower()}", passed=False)
 
     # =========================================================================
     # RUN ALL TESTS
@@ -354,21 +481,28 @@ class MasonE2ETestSuite:
         print("Mason Compound Learning System - E2E Test Suite")
         print("=" * 70)
 
-        start_time = time.time()
+        start_time = time.monotonic()
 
-        self.setup()
+        print("🚀 Setting up test environment...")
 
-        try:
-            self.test_home_page()
-            self.test_backlog_page()
-            self.test_setup_wizard()
-            self.test_api_endpoints()
-            self.test_responsive_design()
+        # Each test runs in its own page
+        tasks = [
+            self.test_home_page,
+            self.test_backlog_page,
+            self.test_setup_wizard,
+            self.test_api_endpoints,
+            self.test_responsive_design,
+        ]
 
-        finally:
-            self.teardown()
+        workers = min(len(tasks), MAX_WORKERS)
+        batches = [tasks[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list() re-raises any worker exception
+            list(executor.map(self.run_tests, range(workers), batches))
 
-        elapsed = time.time() - start_time
+        print("✓ Browsers closed")
+
+        elapsed = time.monotonic() - start_time
 
         # Print summary
         self.print_summary(elapsed)
@@ -396,17 +530,21 @@ class MasonE2ETestSuite:
 
         # Save detailed results to JSON
         results_file = self.screenshots_dir / "test_results.json"
-        with open(results_file, 'w') as f:
-            json.dump({
-                "summary": {
-                    "total": len(self.test_results),
-                    "passed": len(passed),
-                    "failed": len(failed),
-                    "duration": elapsed_time
-                },
-                "tests": self.test_results,
-                "console_messages": self.console_messages
-            }, f, indent=2)
+        payload = {
+            "summary": {
+                "total": len(self.test_results),
+                "passed": len(passed),
+                "failed": len(failed),
+                "duration": elapsed_time
+            },
+            "tests": self.test_results,
+            "console_messages": list(self.console_messages)
+        }
+        # Serialize in one go and write once
+        if orjson is not None:
+            results_file.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+        else:
+            results_file.write_text(json.dumps(payload, indent=2))
 
         print(f"📄 Detailed results: {results_file}")
 
@@ -13,74 +13,158 @@ Arguments:
   --server CMD: Command to start a server (can be specified multiple times)
   --port PORT: Port to check for readiness (can be specified multiple times, matches order of --server)
   --timeout SECS: Timeout in seconds to wait for servers (default: 60)
+  --capture-server-logs: Forward server output to stderr (discarded by default)
   --: Separator before the command to run (required)
   CMD: Command to run after servers are ready
 """
 
 import argparse
+import errno
+import re
+import selectors
+import shlex
 import subprocess
 import sys
+import threading
 import time
 import socket
 import signal
 import os
-from typing import List, Tuple
+from typing import BinaryIO, List, Tuple
+
+# Readiness probe backoff: first retry delay and cap, in seconds
+PROBE_INITIAL_DELAY = 0.01
+PROBE_MAX_DELAY = 0.25
+
+# connect_ex() results meaning a non-blocking connect is still in progress
+CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN}
+
+def drain_output(stream: BinaryIO, prefix: str):
+    """Forward a server's output to stderr line by line until it closes."""
+    prefix_bytes = prefix.encode()
+    for line in iter(stream.readline, b''):
+        sys.stderr.buffer.write(prefix_bytes + line)
+        sys.stderr.buffer.flush()
+    stream.close()
+
+# Commands that need a shell: chaining, pipes, redirects, expansion, comments, cd,
+# leading VAR=value assignments
+SHELL_SYNTAX_RE = re.compile(r'[;&|<>(){}`$*?~#\n]|^\s*cd\s|^\s*\w+=')
+
+def server_argv(cmd: str):
+    """
+    Split a server command for direct exec, or return None if it needs a shell.
+
+    Windows always goes through the shell so that npm/pnpm .cmd shims resolve.
+    """
+    if sys.platform == 'win32' or SHELL_SYNTAX_RE.search(cmd):
+        return None
+    try:
+        return shlex.split(cmd)
+    except ValueError:
+        # Unbalanced quotes; let the shell report it
+        return None
 
 class ServerManager:
-    def __init__(self, servers: List[Tuple[str, int]], timeout: int = 60):
+    def __init__(self, servers: List[Tuple[str, int]], timeout: int = 60,
+                 capture_logs: bool = False):
         self.servers = servers  # List of (command, port) tuples
         self.timeout = timeout
+        self.capture_logs = capture_logs
         self.processes: List[subprocess.Popen] = []
 
-    def is_port_open(self, port: int) -> bool:
+    def is_port_open(self, port: int, timeout: float = 1.0) -> bool:
         """Check if a port is accepting connections."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)
         try:
-            result = sock.connect_ex(('localhost', port))
-            return result == 0
-        except:
+            addresses = socket.getaddrinfo('localhost', port, type=socket.SOCK_STREAM)
+        except OSError:
             return False
-        finally:
-            sock.close()
+
+        # Try each address localhost resolves to (IPv4 and/or IPv6)
+        for family, sock_type, proto, _, address in addresses:
+            sock = socket.socket(family, sock_type, proto)
+            sock.setblocking(False)
+            try:
+                result = sock.connect_ex(address)
+                if result in CONNECT_PENDING:
+                    # Wait for the connect to complete instead of blocking on it
+                    with selectors.DefaultSelector() as selector:
+                        selector.register(sock, selectors.EVENT_WRITE)
+                        if not selector.select(timeout):
+                            continue
+                    result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if result == 0:
+                    return True
+            except OSError:
+                pass
+            finally:
+                sock.close()
+
+        return False
+
+    def liveness(self, port: int) -> bool:
+        """
+        Check that a ready server is still listening.
+
+        Opens a fresh connection each time; holding a probe connection open
+        would block servers that handle one connection at a time.
+        """
+        return self.is_port_open(port)
 
     def wait_for_port(self, port: int) -> bool:
         """Wait for a port to become available."""
-        start_time = time.time()
+        deadline = time.monotonic() + self.timeout
+        delay = PROBE_INITIAL_DELAY
         print(f"Waiting for port {port} to be ready...", flush=True)
 
-        while time.time() - start_time < self.timeout:
-            if self.is_port_open(port):
+        while True:
+            probe_start = time.monotonic()
+            remaining = deadline - probe_start
+            if remaining <= 0:
+                return False
+
+            # An immediate liveness check confirms the listener stayed up
+            if self.is_port_open(port, min(delay, remaining)) and self.liveness(port):
                 print(f"✓ Port {port} is ready", flush=True)
                 return True
-            time.sleep(0.5)
 
-        return False
+            # Refused connects return at once; wait out the rest of this step
+            elapsed = time.monotonic() - probe_start
+            time.sleep(max(0.0, min(delay - elapsed, deadline - time.monotonic())))
+            delay = min(delay * 2, PROBE_MAX_DELAY)
 
     def start_servers(self) -> bool:
         """Start all servers and wait for them to be ready."""
         for i, (cmd, port) in enumerate(self.servers, 1):
             print(f"Starting server {i}/{len(self.servers)}: {cmd}", flush=True)
 
-            # Start the server process
+            # Start the server process. Simple commands are exec'd directly so
+            # signals from cleanup() reach the server rather than /bin/sh.
+            # Output is either discarded or drained continuously; an unread
+            # pipe fills up and blocks the server.
+            argv = server_argv(cmd)
             process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                preexec_fn=os.setsid if sys.platform != 'win32' else None
+                argv if argv is not None else cmd,
+                shell=argv is None,
+                stdout=subprocess.PIPE if self.capture_logs else subprocess.DEVNULL,
+                stderr=subprocess.STDOUT if self.capture_logs else subprocess.DEVNULL,
+                start_new_session=sys.platform != 'win32'
             )
             self.processes.append(process)
 
+            if self.capture_logs:
+                threading.Thread(
+                    target=drain_output,
+                    args=(process.stdout, f'[server {i}] '),
+                    daemon=True
+                ).start()
+
             # Wait for the port to be ready
             if not self.wait_for_port(port):
                 print(f"✗ Server on port {port} failed to start within {self.timeout}s", flush=True)
                 self.cleanup()
                 return False
 
-            # Give it a moment to stabilize
-            time.sleep(1)
-
         print(f"✓ All {len(self.servers)} server(s) ready", flush=True)
         return True
 
@@ -146,6 +230,12 @@ def parse_args():
         help='Timeout in seconds to wait for servers (default: 60)'
     )
 
+    parser.add_argument(
+        '--capture-server-logs',
+        action='store_true',
+        help='Forward server output to stderr (discarded by default)'
+    )
+
     # Everything after '--' is the command to run
     args, command = parser.parse_known_args()
 
@@ -163,7 +253,7 @@ def main():
 
     # Create server manager
     servers = list(zip(args.server, args.port))
-    manager = ServerManager(servers, args.timeout)
+    manager = ServerManager(servers, args.timeout, args.capture_server_logs)
 
     try:
         # Start servers